@@ -0,0 +1,45 @@
+import numpy
+
+class VertexArena:
+	"""Reusable float32 vertex storage for one frame, an opaque region followed by an alpha region.
+
+	Each vertex is a row of x, y, z and plane type. The storage grows geometrically when a
+	frame needs more room and never shrinks, so steady-state frames allocate nothing.
+	"""
+
+	def __init__(self, capacity=0x10000):
+		self.buffer = numpy.empty((capacity, 4), dtype='f')
+		self.opaqueCount = 0
+		self.alphaCount = 0
+		self.opaqueNext = 0
+		self.alphaNext = 0
+
+	def reserve(self, opaque, alpha):
+		"""Start a new frame holding the given number of opaque and alpha vertices."""
+
+		if opaque + alpha > len(self.buffer):
+			self.buffer = numpy.empty((max(opaque + alpha, 2 * len(self.buffer)), 4), dtype='f')
+
+		self.opaqueCount = opaque
+		self.alphaCount = alpha
+		self.opaqueNext = 0
+		self.alphaNext = opaque
+
+	def opaque(self, n):
+		"""Return a view of the next n vertices of the opaque region."""
+		start = self.opaqueNext
+		if start + n > self.opaqueCount:
+			raise IndexError('Opaque region of the vertex arena is full')
+		self.opaqueNext += n
+		return self.buffer[start:self.opaqueNext]
+
+	def alpha(self, n):
+		"""Return a view of the next n vertices of the alpha region."""
+		start = self.alphaNext
+		if start + n > self.opaqueCount + self.alphaCount:
+			raise IndexError('Alpha region of the vertex arena is full')
+		self.alphaNext += n
+		return self.buffer[start:self.alphaNext]
+
+	def vertices(self):
+		return self.buffer[:self.opaqueCount + self.alphaCount]
@@ -0,0 +1,43 @@
+import numpy
+
+from snapshot import MEM1_START, inMem1
+from gamestructs import CHECK_LIST, CHECK_DATA
+
+class CheckListWalker:
+	"""Walk the map's check lists over a Snapshot, reading each list node once.
+
+	Many cells share list tails and triangles, so a walk stops as soon as it reaches a
+	node already visited for the same category, and node contents are kept across
+	categories. Nodes are memoized for the lifetime of the walker, so make a new one
+	for every frame.
+	"""
+
+	def __init__(self, snapshot):
+		self.snapshot = snapshot
+		self.links = {} # node -> (next node, check data)
+		self.seen = {} # category -> nodes already walked
+		self.found = {} # category -> check data encountered, with repeats
+
+	def walk(self, checkList, category):
+		data = self.snapshot.data
+		unpack = CHECK_LIST.struct.unpack_from
+		links = self.links
+		seen = self.seen.setdefault(category, set())
+		found = self.found.setdefault(category, [])
+
+		while inMem1(checkList, CHECK_LIST.size) and checkList not in seen:
+			seen.add(checkList)
+			link = links.get(checkList)
+			if link is None:
+				link = links[checkList] = unpack(data, checkList - MEM1_START)
+			checkList, checkData = link
+			found.append(checkData)
+
+	def checkData(self, category):
+		"""Return a sorted array of the unique check data addresses found for category."""
+		found = numpy.unique(numpy.array(self.found.get(category, ()), dtype='i8'))
+		return found[inMem1(found, CHECK_DATA.size)]
+
+	def nodes(self):
+		"""Return an array of every list node visited."""
+		return numpy.fromiter(self.links, dtype='i8', count=len(self.links))
@@ -1,6 +1,11 @@
-import sys, pyrr
+from time import perf_counter
+startTime = perf_counter()
+
+import os, sys
 import traceback
 
+from functools import lru_cache
+
 from enum import IntEnum
 
 from PyQt5 import QtCore
@@ -8,316 +13,537 @@ from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 
 from OpenGL.GL import *
-from OpenGL.GLUT import *
-from OpenGL.GLU import *
 from OpenGL.arrays import vbo
-from OpenGL.GL import shaders
 
+import numpy
 from numpy import array, pi, cos, sin, concatenate as concat
 tau = 2*pi
 
 from memorylib import Dolphin
+from snapshot import Snapshot, DirtyPages, inMem1
+from checklist import CheckListWalker
+from arena import VertexArena
+import shadercache
+from oit import TransparencyBuffers
+from gamestructs import GAME_POINTERS, CAMERA, MAP_COLLISION_DATA, CHECK_LIST_CELL, CHECK_LIST, CHECK_DATA, CUBE_MANAGER, CUBE_INFO, CUBE, MARIO
 
 PlaneType = IntEnum('SurfaceType', 'FLOOR WATER ROOF WALLZ WALLX CUBE HITBOX')
 
-class CollisionViewer(QtWidgets.QOpenGLWidget):
+WATER_TYPES = [0x100, 0x101, 0x102, 0x103, 0x104, 0x105, 0x4104]
+
+# number of sides of the cylinder drawn for Mario's hitbox
+CYLINDER_SIDES = 12
+
+# corners of a cube volume, relative to the center of its base and in units of its size
+CUBE_CORNERS = array([
+	[-.5, 0, -.5], [-.5, 1, -.5], [-.5, 0, .5], [-.5, 1, .5],
+	[.5, 0, .5], [.5, 1, .5], [.5, 0, -.5], [.5, 1, -.5],
+], dtype='f')
+CUBE_FACES = array([
+	0, 2, 1, 1, 2, 3, # outward -x
+	2, 4, 3, 3, 4, 5, # outward +z
+	4, 6, 5, 5, 6, 7, # outward +x
+	6, 0, 7, 7, 0, 1, # outward -z
+	0, 4, 2, 0, 6, 4, # outward -y
+	1, 3, 5, 1, 5, 7, # outward +y
+])
+
+VERTEX_SHADER = """#version 330 core
+	uniform mat4 projMat;
+	uniform mat4 viewMat;
+
+	layout (location = 0) in vec3 position;
+	layout (location = 1) in float type;
+
+	out vec4 vBorderColor;
+	out vec4 vVertexColor;
+	out float vDepth;
+
+	void main() {
+		vec4 viewPosition = viewMat * vec4(position, 1.0);
+		gl_Position = projMat * viewPosition;
+		vDepth = -viewPosition.z;
+
+		vBorderColor = vec4(0, 0, 0, 1);
+		
+		if (type == """ + str(int(PlaneType.FLOOR)) + """) {
+			vVertexColor = vec4(0, 0, 1, 1);
+		} else if (type == """ + str(int(PlaneType.WATER)) + """) {
+			vVertexColor = vec4(0, 0.8, 1, 0.6);
+		} else if (type == """ + str(int(PlaneType.ROOF)) + """) {
+			vVertexColor = vec4(1, 0, 0, 1);
+		} else if (type == """ + str(int(PlaneType.WALLZ)) + """) {
+			vVertexColor = vec4(0, 1, 0, 1);
+		} else if (type == """ + str(int(PlaneType.WALLX)) + """) {
+			vVertexColor = vec4(0, 0.5, 0, 1);
+		} else if (type == """ + str(int(PlaneType.CUBE)) + """) {
+			vBorderColor = vVertexColor = vec4(1, 0.5, 0, 0.5);
+		} else if (type == """ + str(int(PlaneType.HITBOX)) + """) {
+			vBorderColor = vVertexColor = vec4(1, 0.5, 1, 0.7);
+		} else {
+			vVertexColor = vec4(0.5, 0.5, 0.5, 1);
+		}
+	}"""
+
+GEOMETRY_SHADER = """#version 330 core
+	layout(triangles) in;
+	layout(triangle_strip, max_vertices = 3) out;
+
+	in vec4 vBorderColor[3];
+	in vec4 vVertexColor[3];
+	in float vDepth[3];
+	out vec3 gTriDistance;
+	out float gTriSize;
+	out vec4 gBorderColor;
+	out vec4 gVertexColor;
+	out float gDepth;
+
+	void main() {
+		gTriSize = max(max(distance(gl_in[0].gl_Position, gl_in[1].gl_Position),
+				distance(gl_in[0].gl_Position, gl_in[2].gl_Position)),
+				distance(gl_in[1].gl_Position, gl_in[2].gl_Position));
+
+		gTriDistance = vec3(1, 0, 0);
+		gBorderColor = vBorderColor[0];
+		gVertexColor = vVertexColor[0];
+		gDepth = vDepth[0];
+		gl_Position = gl_in[0].gl_Position;
+		EmitVertex();
+
+		gTriDistance = vec3(0, 1, 0);
+		gBorderColor = vBorderColor[1];
+		gVertexColor = vVertexColor[1];
+		gDepth = vDepth[1];
+		gl_Position = gl_in[1].gl_Position;
+		EmitVertex();
+
+		gTriDistance = vec3(0, 0, 1);
+		gBorderColor = vBorderColor[2];
+		gVertexColor = vVertexColor[2];
+		gDepth = vDepth[2];
+		gl_Position = gl_in[2].gl_Position;
+		EmitVertex();
+
+		EndPrimitive();
+	}"""
+
+FRAGMENT_SHADER = """#version 330 core
+	in vec3 gTriDistance;
+	in float gTriSize;
+	in vec4 gBorderColor;
+	in vec4 gVertexColor;
+	out vec4 color;
+
+	float amplify(float d, float scale, float offset) {
+		d = scale * d + offset;
+		d = clamp(d, 0, 1);
+		d = 1 - exp2(-2*d*d);
+		return d;
+	}
+
+	void main() {
+		float d1 = min(min(gTriDistance.x, gTriDistance.y), gTriDistance.z);
+		float step = smoothstep(0, fwidth(d1), d1);
+		color = step * gVertexColor + (1 - step) * gBorderColor;
+	}"""
+
+# weighted blended order-independent transparency, see oit.TransparencyBuffers
+TRANSPARENT_FRAGMENT_SHADER = """#version 330 core
+	in vec3 gTriDistance;
+	in vec4 gBorderColor;
+	in vec4 gVertexColor;
+	in float gDepth;
+	layout(location = 0) out vec4 accum;
+	layout(location = 1) out float weight;
+
+	void main() {
+		float d1 = min(min(gTriDistance.x, gTriDistance.y), gTriDistance.z);
+		float step = smoothstep(0, fwidth(d1), d1);
+		vec4 color = step * gVertexColor + (1 - step) * gBorderColor;
+
+		// favour fragments close to the camera, using McGuire and Bavoil's weight with view
+		// depth in metres rather than game units; the low upper bound keeps the half-float
+		// sums finite over a few hundred layers
+		float z = gDepth / 100.0;
+		float w = color.a * clamp(10.0 / (1e-5 + pow(z / 5.0, 2.0) + pow(z / 200.0, 6.0)), 1e-2, 2e2);
+		accum = vec4(color.rgb * w, color.a);
+		weight = w;
+	}"""
+
+def perspective(fovy, aspect, near, far):
+	"""Return a perspective projection matrix, fovy being in degrees."""
+
+	f = 1 / numpy.tan(fovy * pi / 360)
+	return array([
+		[f / aspect, 0, 0, 0],
+		[0, f, 0, 0],
+		[0, 0, (far + near) / (near - far), -1],
+		[0, 0, 2 * far * near / (near - far), 0],
+	], dtype='f')
+
+def lookAt(eye, target, up):
+	"""Return a view matrix for a camera at eye looking towards target."""
+
+	eye, target, up = array(eye), array(target), array(up)
+	forward = target - eye
+	forward /= numpy.linalg.norm(forward)
+	side = numpy.cross(forward, up)
+	side /= numpy.linalg.norm(side)
+	up = numpy.cross(side, forward)
+	up /= numpy.linalg.norm(up)
+	return array([
+		[side[0], up[0], -forward[0], 0],
+		[side[1], up[1], -forward[1], 0],
+		[side[2], up[2], -forward[2], 0],
+		[-side @ eye, -up @ eye, forward @ eye, 1],
+	], dtype='f')
+
+@lru_cache
+def cylinderTemplate(n):
+	"""Return the vertices of a unit cylinder with n sides, as used by CollisionViewer.makeCylinder."""
+
+	th = tau * numpy.arange(n + 1) / n
+	c, s = cos(th), sin(th)
+	out = numpy.zeros((n, 12, 3), dtype='f')
+	for i in range(n):
+		v0 = [c[i], 0, s[i]]
+		v1 = [c[i + 1], 0, s[i + 1]]
+		w0 = [c[i], 1, s[i]]
+		w1 = [c[i + 1], 1, s[i + 1]]
+		out[i] = [
+			# bottom and top triangle
+			[0, 0, 0], v0, v1,
+			[0, 1, 0], w1, w0,
+			# side rectangle
+			v0, w1, v1,
+			w1, v0, w0,
+		]
+
+	return out.reshape(-1, 3)
+
+class CollisionRenderer:
+	"""Draw the collision found in MEM1 into the current OpenGL context.
+
+	This holds everything but the window, so it can render to a widget or offscreen alike.
+	memory is anything with Dolphin's read_ram, e.g. a Dolphin or a MEM1 dump.
+	"""
+
 	gpCamera = 0
 	gpCubeFastA = 0
 	gpMapCollisionData = 0
 	gpMarioOriginal = 0
 
-	def __init__(self, dolphin: Dolphin, parent=None):
-		self.dolphin = dolphin
-		self.parent = parent
-		QtWidgets.QOpenGLWidget.__init__(self, parent)
-		self.resize(800, 600)
-		self.frameSwapped.connect(self.update)
+	def __init__(self, memory):
+		self.snapshot = Snapshot(memory)
+		self.pages = DirtyPages()
+		self.checkListPages = None
+		self.checkListState = None
+		self.checkData = {}
+		self.triangles = {}
+		self.trianglePages = {}
+		self.isWater = None
+		self.cubePages = None
+		self.cubeVerts = None
+		self.arena = VertexArena()
+
+	def setGame(self, memory):
+		"""Pick the pointers matching the game in memory. Return False if it is not a known version of Sunshine."""
+
+		if bytes(memory.read_ram(0, 3)) != b'GMS':
+			return False
+
+		pointers = GAME_POINTERS.get(int(memory.read_ram(0x365DDD, 1)[0]))
+		if pointers is None:
+			return False
+
+		self.gpCamera, self.gpCubeFastA, self.gpMapCollisionData, self.gpMarioOriginal = pointers
+		self.snapshot.dolphin = memory
+		return True
+
+	def initialize(self, cacheDir=None) -> None:
+		"""Set up the GL state, shaders and buffers; cacheDir is where linked shader programs are cached."""
 
-	def initializeGL(self) -> None:
-		glEnable(GL_BLEND)
 		glEnable(GL_CULL_FACE)
 		glEnable(GL_DEPTH_TEST)
-		glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 		glClearColor(0.7, 0.7, 1.0, 0.0)
 
-		self.shader = shaders.compileProgram(
-				shaders.compileShader("""#version 330 core
-				uniform mat4 projMat;
-				uniform mat4 viewMat;
-
-				layout (location = 0) in vec3 position;
-				layout (location = 1) in float type;
-
-				out vec4 vBorderColor;
-				out vec4 vVertexColor;
-
-				void main() {
-					gl_Position = projMat * viewMat * vec4(position, 1.0);
-
-					vBorderColor = vec4(0, 0, 0, 1);
-					
-					if (type == """ + str(int(PlaneType.FLOOR)) + """) {
-						vVertexColor = vec4(0, 0, 1, 1);
-					} else if (type == """ + str(int(PlaneType.WATER)) + """) {
-						vVertexColor = vec4(0, 0.8, 1, 0.6);
-					} else if (type == """ + str(int(PlaneType.ROOF)) + """) {
-						vVertexColor = vec4(1, 0, 0, 1);
-					} else if (type == """ + str(int(PlaneType.WALLZ)) + """) {
-						vVertexColor = vec4(0, 1, 0, 1);
-					} else if (type == """ + str(int(PlaneType.WALLX)) + """) {
-						vVertexColor = vec4(0, 0.5, 0, 1);
-					} else if (type == """ + str(int(PlaneType.CUBE)) + """) {
-						vBorderColor = vVertexColor = vec4(1, 0.5, 0, 0.5);
-					} else if (type == """ + str(int(PlaneType.HITBOX)) + """) {
-						vBorderColor = vVertexColor = vec4(1, 0.5, 1, 0.7);
-					} else {
-						vVertexColor = vec4(0.5, 0.5, 0.5, 1);
-					}
-				}""", GL_VERTEX_SHADER),
-				shaders.compileShader("""#version 330 core
-				layout(triangles) in;
-				layout(triangle_strip, max_vertices = 3) out;
-
-				in vec4 vBorderColor[3];
-				in vec4 vVertexColor[3];
-				out vec3 gTriDistance;
-				out float gTriSize;
-				out vec4 gBorderColor;
-				out vec4 gVertexColor;
-
-				void main() {
-					gTriSize = max(max(distance(gl_in[0].gl_Position, gl_in[1].gl_Position),
-							distance(gl_in[0].gl_Position, gl_in[2].gl_Position)),
-							distance(gl_in[1].gl_Position, gl_in[2].gl_Position));
-
-					gTriDistance = vec3(1, 0, 0);
-					gBorderColor = vBorderColor[0];
-					gVertexColor = vVertexColor[0];
-					gl_Position = gl_in[0].gl_Position;
-					EmitVertex();
-
-					gTriDistance = vec3(0, 1, 0);
-					gBorderColor = vBorderColor[1];
-					gVertexColor = vVertexColor[1];
-					gl_Position = gl_in[1].gl_Position;
-					EmitVertex();
-
-					gTriDistance = vec3(0, 0, 1);
-					gBorderColor = vBorderColor[2];
-					gVertexColor = vVertexColor[2];
-					gl_Position = gl_in[2].gl_Position;
-					EmitVertex();
-
-					EndPrimitive();
-				}""", GL_GEOMETRY_SHADER),
-				shaders.compileShader("""#version 330 core
-				in vec3 gTriDistance;
-				in float gTriSize;
-				in vec4 gBorderColor;
-				in vec4 gVertexColor;
-				out vec4 color;
-
-				float amplify(float d, float scale, float offset) {
-					d = scale * d + offset;
-					d = clamp(d, 0, 1);
-					d = 1 - exp2(-2*d*d);
-					return d;
-				}
-
-				void main() {
-					float d1 = min(min(gTriDistance.x, gTriDistance.y), gTriDistance.z);
-					float step = smoothstep(0, fwidth(d1), d1);
-    				color = step * gVertexColor + (1 - step) * gBorderColor;
-				}""", GL_FRAGMENT_SHADER))
+		startTime = perf_counter()
+		self.shader, cachedOpaque = shadercache.compileProgram([
+			(VERTEX_SHADER, GL_VERTEX_SHADER),
+			(GEOMETRY_SHADER, GL_GEOMETRY_SHADER),
+			(FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+		], cacheDir)
+		self.transparentShader, cachedTransparent = shadercache.compileProgram([
+			(VERTEX_SHADER, GL_VERTEX_SHADER),
+			(GEOMETRY_SHADER, GL_GEOMETRY_SHADER),
+			(TRANSPARENT_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+		], cacheDir)
+		self.transparency = TransparencyBuffers(cacheDir)
+		cached = cachedOpaque and cachedTransparent and self.transparency.cached
+		print('Shaders %s in %.1f ms' % ('loaded from cache' if cached else 'compiled', 1000 * (perf_counter() - startTime)), file=sys.stderr)
 		
 		self.vao = glGenVertexArrays(1)
+		self.vertexBuffer = vbo.VBO(self.arena.vertices(), usage='GL_STREAM_DRAW')
+
+	def readCheckListHeads(self, mapColData):
+		"""Return the map collision data and the (floor, roof, wall) list heads of each of its check list tables."""
+
+		colData = MAP_COLLISION_DATA.read(self.snapshot, mapColData)
+		heads = []
+		for checkLists in colData.checkLists:
+			if checkLists != 0:
+				cells = CHECK_LIST_CELL.readArray(self.snapshot, checkLists, colData.checkListCount)
+				heads.append(numpy.stack([cells['floors'], cells['roofs'], cells['walls']], axis=1))
+		return colData, heads
+
+	def checkListsChanged(self, mapColData):
+		"""Return whether the list heads or any node walked last time read back differently."""
+
+		if self.checkListState is None:
+			return True
+
+		oldMapColData, oldColData, oldHeads, nodes, links = self.checkListState
+		colData, heads = self.readCheckListHeads(mapColData)
+		if mapColData != oldMapColData or colData != oldColData:
+			return True
+		if not all(numpy.array_equal(a, b) for a, b in zip(heads, oldHeads)):
+			return True
+
+		current = CHECK_LIST.gather(self.snapshot, nodes)
+		return not (numpy.array_equal(current['next'], links['next']) and numpy.array_equal(current['checkData'], links['checkData']))
+
+	def walkCheckLists(self, mapColData):
+		"""Collect the check data referenced by the map's check lists, and the pages they live on."""
+
+		mem = self.snapshot
+		walker = CheckListWalker(mem)
+		pages = [self.pages.span(self.gpMapCollisionData, 4), self.pages.span(mapColData, MAP_COLLISION_DATA.size)]
+
+		colData, heads = self.readCheckListHeads(mapColData)
+		tables = [checkLists for checkLists in colData.checkLists if checkLists != 0]
+		for checkLists, cells in zip(tables, heads):
+			pages.append(self.pages.span(checkLists, CHECK_LIST_CELL.size * colData.checkListCount))
+			for floor, roof, wall in cells.tolist():
+				walker.walk(floor, PlaneType.FLOOR)
+				walker.walk(roof, PlaneType.ROOF)
+				walker.walk(wall, PlaneType.WALLZ)
+
+		nodes = walker.nodes()
+		pages.append(self.pages.pages(nodes, CHECK_LIST.size))
+		self.checkListPages = numpy.unique(concat(pages))
+		self.checkListState = (mapColData, colData, heads, nodes, CHECK_LIST.gather(mem, nodes))
+
+		# keep the previous arrays when nothing changed, so the triangle caches are updated in place
+		for kind in (PlaneType.FLOOR, PlaneType.ROOF, PlaneType.WALLZ):
+			checkData = walker.checkData(kind)
+			if not numpy.array_equal(self.checkData.get(kind), checkData):
+				self.checkData[kind] = checkData
+
+	def extractTriangles(self, addrs, kind):
+		"""Return an (N, 3, 4) array of the vertices of the TBGCheckData at addrs.
+
+		kind -- PlaneType.FLOOR, ROOF or WALLZ, picking how each triangle's type is decided
+		"""
+
+		checkData = CHECK_DATA.gather(self.snapshot, addrs)
+		verts = numpy.empty((len(addrs), 3, 4), dtype='f')
+		verts[:, :, :3] = checkData['vertices'].reshape(-1, 3, 3)
+
+		if kind == PlaneType.FLOOR:
+			isWater = numpy.isin(checkData['type'], WATER_TYPES)
+			verts[:, :, 3] = numpy.where(isWater, PlaneType.WATER, PlaneType.FLOOR)[:, None]
+		elif kind == PlaneType.WALLZ:
+			isWallX = checkData['flags'] & 0x8 != 0
+			verts[:, :, 3] = numpy.where(isWallX, PlaneType.WALLX, PlaneType.WALLZ)[:, None]
+		else:
+			verts[:, :, 3] = kind
+
+		return verts
+
+	def refreshTriangles(self, kind):
+		"""Update the cached vertices of one kind of check data, re-extracting only
+		triangles that are new or whose pages changed."""
+
+		addrs = self.checkData[kind]
+		oldAddrs, verts = self.triangles.get(kind, (None, None))
+
+		if oldAddrs is addrs: # same check data, update it in place
+			if not self.pages.isDirty(self.trianglePages[kind]):
+				return
+			stale = self.pages.touched(addrs, CHECK_DATA.size)
+			if stale.any():
+				verts[stale] = self.extractTriangles(addrs[stale], kind)
+		else:
+			# reuse the cache's storage unless the number of triangles changed
+			oldVerts = verts
+			if verts is None or len(verts) != len(addrs):
+				verts = numpy.empty((len(addrs), 3, 4), dtype='f')
+			if oldAddrs is None or len(oldAddrs) == 0:
+				stale = numpy.ones(len(addrs), dtype=bool)
+			else:
+				pos = numpy.searchsorted(oldAddrs, addrs).clip(0, len(oldAddrs) - 1)
+				stale = (oldAddrs[pos] != addrs) | self.pages.touched(addrs, CHECK_DATA.size)
+				verts[~stale] = oldVerts[pos[~stale]]
+
+			verts[stale] = self.extractTriangles(addrs[stale], kind)
+			self.triangles[kind] = (addrs, verts)
+			self.trianglePages[kind] = self.pages.pages(addrs, CHECK_DATA.size)
+
+		if kind == PlaneType.FLOOR:
+			self.isWater = verts[:, 0, 3] == PlaneType.WATER
+			self.isFloor = ~self.isWater
+
+	def refreshCubes(self):
+		"""Rebuild the cube volumes if any page they were read from changed."""
+
+		if self.cubePages is not None and not self.pages.isDirty(self.cubePages):
+			return
 
-	def getCheckData(self, checkList):
-		out = set()
+		mem = self.snapshot
+		cubes = set()
+		pages = [self.pages.span(self.gpCubeFastA, 0xC)]
 
-		while checkList >= 0x80000000:
-			checkData = self.dolphin.read_uint32(checkList + 0x8)
-			if checkData >= 0x80000000:
-				out.add(checkData)
-			checkList = self.dolphin.read_uint32(checkList + 0x4)
+		for manager in mem.gather([self.gpCubeFastA], ('>u4', (3,)))[0].tolist():
+			if not inMem1(manager, CUBE_MANAGER.size):
+				continue
 
-		return out
+			pages.append(self.pages.span(manager, CUBE_MANAGER.size))
+			manager = CUBE_MANAGER.read(mem, manager)
+			if not inMem1(manager.info, CUBE_INFO.size):
+				continue
 
-	def makeCylinder(self, x, y, z, h, r, n, pt = PlaneType.HITBOX):
-		"""Return a list of triangles approximating a cylinder oriented along the Y axis.
+			pages.append(self.pages.span(manager.info, CUBE_INFO.size))
+			info = CUBE_INFO.read(mem, manager.info)
+			if not inMem1(info.cubes, 4 * manager.count):
+				continue
+
+			pages.append(self.pages.span(info.cubes, 4 * manager.count))
+			cubes.update(mem.gather([info.cubes], ('>u4', (manager.count,)))[0].tolist())
+
+		# entries are briefly null or stale while a level loads
+		cubes = numpy.array(sorted(cubes), dtype='i8')
+		cubes = cubes[inMem1(cubes, CUBE.size)]
+		pages.append(self.pages.pages(cubes, CUBE.size))
+
+		cubes = CUBE.gather(mem, cubes)
+		self.cubePages = numpy.unique(concat(pages))
+		corners = cubes['center'][:, None, :] + CUBE_CORNERS * cubes['size'][:, None, :]
+		verts = numpy.empty((len(cubes), len(CUBE_FACES), 4), dtype='f')
+		verts[:, :, :3] = corners[:, CUBE_FACES]
+		verts[:, :, 3] = PlaneType.CUBE
+		self.cubeVerts = verts.reshape(-1, 4)
+
+	def makeCylinder(self, out, x, y, z, h, r, n, pt = PlaneType.HITBOX):
+		"""Write triangles approximating a cylinder oriented along the Y axis into out, a (12*n, 4) array.
 
 		x, y, z -- coordinates of the center of the cylinder's base
 		h -- height of the cylinder
 		r -- radius of the cylinder
 		n -- number of sides of the polygon used in place of the circular faces
 		"""
-		
-		result = []
-		y1 = y + h # height
-
-		## loop each side
-		th = 0
-		for i in range(1, n + 1):
-			th0, th = th, tau * i / n
-			x0 = x + r * cos(th0)
-			z0 = z + r * sin(th0)
-			x1 = x + r * cos(th)
-			z1 = z + r * sin(th)
-			result += [
-				# bottom and top triangle
-				[x, y, z, pt], [x0, y, z0, pt], [x1, y, z1, pt],
-				[x, y1, z, pt], [x1, y1, z1, pt], [x0, y1, z0, pt],
-				# side rectangle
-				[x0, y, z0, pt], [x1, y1, z1, pt], [x1, y, z1, pt],
-				[x1, y1, z1, pt], [x0, y, z0, pt], [x0, y1, z0, pt],
-			]
-
-		return result
-	
-	def paintGL(self) -> None:
-		try: # prevent crashing on level transition
-			self._paintGL()
-		except:
-			traceback.print_exc()
+
+		numpy.multiply(cylinderTemplate(n), (r, h, r), out=out[:, :3])
+		out[:, :3] += (x, y, z)
+		out[:, 3] = pt
 	
-	def _paintGL(self) -> None:
+	def render(self, aspect) -> None:
 		if self.gpCamera == 0 or self.gpMapCollisionData == 0:
 			return
 
 		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-		camera = self.dolphin.read_uint32(self.gpCamera)
+		mem = self.snapshot
+		mem.update()
+		self.pages.update(mem)
+
+		camera = mem.read_uint32(self.gpCamera)
 		if camera == 0:
 			return
 
-		projMat = pyrr.matrix44.create_perspective_projection_matrix(self.dolphin.read_float(camera + 0x48), self.aspect,
-				self.dolphin.read_float(camera + 0x28), self.dolphin.read_float(camera + 0x2C))
-		viewMat = pyrr.matrix44.create_look_at(
-				[self.dolphin.read_float(camera + 0x124), self.dolphin.read_float(camera + 0x128), self.dolphin.read_float(camera + 0x12C)],
-				[self.dolphin.read_float(camera + 0x148), self.dolphin.read_float(camera + 0x14C), self.dolphin.read_float(camera + 0x150)],
-				[self.dolphin.read_float(camera + 0x30), self.dolphin.read_float(camera + 0x34), self.dolphin.read_float(camera + 0x38)])
+		camera = CAMERA.read(mem, camera)
+		projMat = perspective(camera.fovy, aspect, camera.near, camera.far)
+		viewMat = lookAt(camera.position, camera.target, camera.up)
 
-		floors = set()
-		roofs = set()
-		walls = set()
-		cubes = set()
-		
-		mapColData = self.dolphin.read_uint32(self.gpMapCollisionData)
+		mapColData = mem.read_uint32(self.gpMapCollisionData)
 		if mapColData == 0:
 			return
-		
-		checkListCount = self.dolphin.read_uint32(mapColData + 0x10)
-		checkLists1 = self.dolphin.read_uint32(mapColData + 0x14)
-		checkLists2 = self.dolphin.read_uint32(mapColData + 0x18)
-
-		for i in range(checkListCount):
-			if checkLists1 != 0:
-				floors |= self.getCheckData(self.dolphin.read_uint32(checkLists1 + 0x24 * i + 0x4))
-				roofs |= self.getCheckData(self.dolphin.read_uint32(checkLists1 + 0x24 * i + 0x10))
-				walls |= self.getCheckData(self.dolphin.read_uint32(checkLists1 + 0x24 * i + 0x1C))
-			
-			if checkLists2 != 0:
-				floors |= self.getCheckData(self.dolphin.read_uint32(checkLists2 + 0x24 * i + 0x4))
-				roofs |= self.getCheckData(self.dolphin.read_uint32(checkLists2 + 0x24 * i + 0x10))
-				walls |= self.getCheckData(self.dolphin.read_uint32(checkLists2 + 0x24 * i + 0x1C))
-		
-		for i in range(3):
-			cube = self.dolphin.read_uint32(self.gpCubeFastA + 4 * i)
-			if cube < 0x80000000:
-				continue
-			
-			length = self.dolphin.read_uint8(cube + 0x10)
-			infoptr = self.dolphin.read_uint32(cube + 0x14)
-			if infoptr < 0x80000000:
-				continue
 
-			info = self.dolphin.read_uint32(infoptr + 0x10)
-			if info < 0x80000000:
-				continue
+		# only walk the check lists and re-read the triangles and cubes whose pages changed
+		if self.checkListPages is None or self.pages.isDirty(self.checkListPages):
+			if self.checkListsChanged(mapColData):
+				self.walkCheckLists(mapColData)
+		for kind in self.checkData:
+			self.refreshTriangles(kind)
+		self.refreshCubes()
+		self.pages.clear()
+
+		floors = self.triangles[PlaneType.FLOOR][1]
+		roofs = self.triangles[PlaneType.ROOF][1]
+		walls = self.triangles[PlaneType.WALLZ][1]
+		water = numpy.count_nonzero(self.isWater)
+
+		# faces with alpha==1 go first, then faces with alpha<1
+		arena = self.arena
+		cylinder = len(cylinderTemplate(CYLINDER_SIDES))
+		arena.reserve(3 * (len(floors) - water + len(roofs) + len(walls)), cylinder + 3 * water + len(self.cubeVerts))
+
+		numpy.compress(self.isFloor, floors, axis=0, out=arena.opaque(3 * (len(floors) - water)).reshape(-1, 3, 4))
+		arena.opaque(3 * len(roofs))[:] = roofs.reshape(-1, 4)
+		arena.opaque(3 * len(walls))[:] = walls.reshape(-1, 4)
 
-			for j in range(length):
-				cubes.add(self.dolphin.read_uint32(info + 4 * j))
+		# Mario's hitbox
+		x, y, z = MARIO.read(mem, mem.read_uint32(self.gpMarioOriginal)).position
+		self.makeCylinder(arena.alpha(cylinder), x, y, z, 160, 50, CYLINDER_SIDES)
+		numpy.compress(self.isWater, floors, axis=0, out=arena.alpha(3 * water).reshape(-1, 3, 4))
+		arena.alpha(len(self.cubeVerts))[:] = self.cubeVerts
 
-		bufOpaque = [] # faces with alpha==1
-		bufAlpha = [] # faces with alpha<1
-		buffers = [bufOpaque, bufAlpha]
+		buffer = arena.vertices()
+		vertexBuffer = self.vertexBuffer
+		vertexBuffer.set_array(buffer)
 
-		# Mario's hitbox
-		ptrMario = self.dolphin.read_uint32(self.gpMarioOriginal)
-		x, y, z = (self.dolphin.read_float(ptrMario+i) for i in (0x10, 0x14, 0x18))
-		bufAlpha += self.makeCylinder(x, y, z, 160, 50, 12)
-
-		for f in floors:
-			isWater = self.dolphin.read_uint16(f) in [0x100, 0x101, 0x102, 0x103, 0x104, 0x105, 0x4104]
-			ptype = PlaneType.WATER if isWater else PlaneType.FLOOR
-			buffers[1 if isWater else 0] += [ # [1]=bufAlpha(WATER), [0]=bufOpaque(FLOOR)
-				[self.dolphin.read_float(f + 0x10), self.dolphin.read_float(f + 0x14), self.dolphin.read_float(f + 0x18), ptype],
-				[self.dolphin.read_float(f + 0x1C), self.dolphin.read_float(f + 0x20), self.dolphin.read_float(f + 0x24), ptype],
-				[self.dolphin.read_float(f + 0x28), self.dolphin.read_float(f + 0x2C), self.dolphin.read_float(f + 0x30), ptype]
-			]
-
-		for r in roofs:
-			bufOpaque += [
-				[self.dolphin.read_float(r + 0x10), self.dolphin.read_float(r + 0x14), self.dolphin.read_float(r + 0x18), PlaneType.ROOF],
-				[self.dolphin.read_float(r + 0x1C), self.dolphin.read_float(r + 0x20), self.dolphin.read_float(r + 0x24), PlaneType.ROOF],
-				[self.dolphin.read_float(r + 0x28), self.dolphin.read_float(r + 0x2C), self.dolphin.read_float(r + 0x30), PlaneType.ROOF]
-			]
-
-		for w in walls:
-			ptype = PlaneType.WALLX if self.dolphin.read_uint16(w + 0x4) & 0x8 else PlaneType.WALLZ
-			bufOpaque += [
-				[self.dolphin.read_float(w + 0x10), self.dolphin.read_float(w + 0x14), self.dolphin.read_float(w + 0x18), ptype],
-				[self.dolphin.read_float(w + 0x1C), self.dolphin.read_float(w + 0x20), self.dolphin.read_float(w + 0x24), ptype],
-				[self.dolphin.read_float(w + 0x28), self.dolphin.read_float(w + 0x2C), self.dolphin.read_float(w + 0x30), ptype]
-			]
-		
-		for c in cubes:
-			cx, cy, cz = self.dolphin.read_float(c + 0xC), self.dolphin.read_float(c + 0x10), self.dolphin.read_float(c + 0x14)
-			dx, dy, dz = self.dolphin.read_float(c + 0x24), self.dolphin.read_float(c + 0x28), self.dolphin.read_float(c + 0x2C)
-
-			v = [
-				[cx - .5 * dx, cy, cz - .5 * dz, PlaneType.CUBE], [cx - .5 * dx, cy + dy, cz - .5 * dz, PlaneType.CUBE],
-				[cx - .5 * dx, cy, cz + .5 * dz, PlaneType.CUBE], [cx - .5 * dx, cy + dy, cz + .5 * dz, PlaneType.CUBE],
-				[cx + .5 * dx, cy, cz + .5 * dz, PlaneType.CUBE], [cx + .5 * dx, cy + dy, cz + .5 * dz, PlaneType.CUBE],
-				[cx + .5 * dx, cy, cz - .5 * dz, PlaneType.CUBE], [cx + .5 * dx, cy + dy, cz - .5 * dz, PlaneType.CUBE]
-			]
-
-			bufAlpha += [
-				v[0], v[1], v[2], v[1], v[3], v[2], # inward -x
-				v[2], v[3], v[4], v[3], v[5], v[4], # inward +z
-				v[4], v[5], v[6], v[5], v[7], v[6], # inward +x
-				v[6], v[7], v[0], v[7], v[1], v[0], # inward -z
-				v[0], v[2], v[4], v[0], v[4], v[6], # inward -y
-				v[1], v[5], v[3], v[1], v[7], v[5], # inward +y
-				v[0], v[2], v[1], v[1], v[2], v[3], # outward -x
-				v[2], v[4], v[3], v[3], v[4], v[5], # outward +z
-				v[4], v[6], v[5], v[5], v[6], v[7], # outward +x
-				v[6], v[0], v[7], v[7], v[0], v[1], # outward -z
-				v[0], v[4], v[2], v[0], v[6], v[4], # outward -y
-				v[1], v[3], v[5], v[1], v[5], v[7], # outward +y
-			]
-
-		glUseProgram(self.shader)
-
-		glUniformMatrix4fv(glGetUniformLocation(self.shader, 'projMat'), 1, False, projMat)
-		glUniformMatrix4fv(glGetUniformLocation(self.shader, 'viewMat'), 1, False, viewMat)
-
-		glBindVertexArray(self.vao)
-		buffer = concat(buffers, dtype='f')
-		vertexBuffer = vbo.VBO(buffer)
+		# opaque faces first, then faces with alpha<1 blended in any order
+		self.transparency.begin()
 		try:
+			glBindVertexArray(self.vao)
 			vertexBuffer.bind()
-			try:
-				glEnableVertexAttribArray(0)
-				glVertexAttribPointer(0, 3, GL_FLOAT, False, 16, vertexBuffer)
-				glEnableVertexAttribArray(1)
-				glVertexAttribPointer(1, 1, GL_FLOAT, False, 16, vertexBuffer + 12)
-				glDrawArrays(GL_TRIANGLES, 0, len(buffer))
-			finally:
-				vertexBuffer.unbind()
+			glEnableVertexAttribArray(0)
+			glVertexAttribPointer(0, 3, GL_FLOAT, False, 16, vertexBuffer)
+			glEnableVertexAttribArray(1)
+			glVertexAttribPointer(1, 1, GL_FLOAT, False, 16, vertexBuffer + 12)
+
+			glUseProgram(self.shader)
+			glUniformMatrix4fv(glGetUniformLocation(self.shader, 'projMat'), 1, False, projMat)
+			glUniformMatrix4fv(glGetUniformLocation(self.shader, 'viewMat'), 1, False, viewMat)
+			glDrawArrays(GL_TRIANGLES, 0, arena.opaqueCount)
+
+			self.transparency.beginTransparent()
+			glUseProgram(self.transparentShader)
+			glUniformMatrix4fv(glGetUniformLocation(self.transparentShader, 'projMat'), 1, False, projMat)
+			glUniformMatrix4fv(glGetUniformLocation(self.transparentShader, 'viewMat'), 1, False, viewMat)
+			glDrawArrays(GL_TRIANGLES, arena.opaqueCount, arena.alphaCount)
 		finally:
+			vertexBuffer.unbind()
 			glBindVertexArray(0)
 			glUseProgram(0)
+			self.transparency.end()
+	
+class CollisionViewer(QtWidgets.QOpenGLWidget):
+	def __init__(self, dolphin: Dolphin, parent=None):
+		self.dolphin = dolphin
+		self.parent = parent
+		self.renderer = CollisionRenderer(dolphin)
+		QtWidgets.QOpenGLWidget.__init__(self, parent)
+		self.resize(800, 600)
+		self.frameSwapped.connect(self.update)
+
+	def initializeGL(self) -> None:
+		self.renderer.initialize(os.path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation), 'shaders'))
+
+	def paintGL(self) -> None:
+		try: # prevent crashing on level transition
+			self.renderer.render(self.aspect)
+		except:
+			traceback.print_exc()
 	
 	def resizeGL(self, w: int, h: int) -> None:
 		self.width = w
@@ -334,24 +560,17 @@ def connect():
 		status.showMessage('MEM1 not found')
 		return
 
-	if dolphin.read_ram(0, 3).tobytes() != b'GMS':
+	if not viewer.renderer.setGame(dolphin):
 		status.showMessage('Current game is not Sunshine')
 		return
 
-	viewer.gpCamera, viewer.gpCubeFastA, viewer.gpMapCollisionData, viewer.gpMarioOriginal = {
-		0x23: (0x8040B370, 0x8040B3B0, 0x8040A578, 0x8040A378), # JP 1.0
-		0xA3: (0x8040D0A8, 0x8040D0E8, 0x8040DEA0, 0x8040E0E8), # NA / KOR
-		0x41: (0x80404808, 0x80404848, 0x80405568, 0x804057B0), # PAL
-		0x80: (0x803FFA38, 0x803FFA78, 0x803FED40, 0x803FEF88), # JP 1.1
-		0x4D: (0x80401D08, 0x80401D48, 0x80402A68, 0x80402CB0), # 3DAS
-	}.get(dolphin.read_uint8(0x80365DDD))
-
 	status.showMessage('Ready')
 
 if __name__ == '__main__':
 	dolphin = Dolphin()
 
 	app = QtWidgets.QApplication(sys.argv)
+	app.setApplicationName('sms-livecol')
 
 	window = QtWidgets.QWidget()
 	layout = QtWidgets.QVBoxLayout(window)
@@ -369,6 +588,7 @@ if __name__ == '__main__':
 	window.setWindowTitle('Super Mario Sunshine Live Collision Viewer')
 	window.resize(800, 600)
 	window.show()
+	QtCore.QTimer.singleShot(0, lambda: print('Window shown in %.1f ms' % (1000 * (perf_counter() - startTime)), file=sys.stderr))
 
 	try:
 		sys.exit(app.exec())
@@ -0,0 +1,117 @@
+import re
+import struct
+from collections import namedtuple
+
+import numpy
+
+from snapshot import MEM1_START
+
+# gpCamera, gpCubeFastA, gpMapCollisionData, gpMarioOriginal for each version, keyed on the byte at 0x80365DDD
+GAME_POINTERS = {
+	0x23: (0x8040B370, 0x8040B3B0, 0x8040A578, 0x8040A378), # JP 1.0
+	0xA3: (0x8040D0A8, 0x8040D0E8, 0x8040DEA0, 0x8040E0E8), # NA / KOR
+	0x41: (0x80404808, 0x80404848, 0x80405568, 0x804057B0), # PAL
+	0x80: (0x803FFA38, 0x803FFA78, 0x803FED40, 0x803FEF88), # JP 1.1
+	0x4D: (0x80401D08, 0x80401D48, 0x80402A68, 0x80402CB0), # 3DAS
+}
+
+_dtypes = {'B': 'u1', 'H': '>u2', 'I': '>u4', 'f': '>f4'}
+
+class GameStruct:
+	"""Layout of one of the game's objects, compiled once for bulk reads out of a Snapshot.
+
+	name -- name of the struct, used for the tuples returned by read
+	size -- size of the struct in bytes
+	fields -- list of (name, offset, format) where format is a struct format character
+	among B, H, I and f, optionally preceded by a count, e.g. '3f' for a vector
+	"""
+
+	def __init__(self, name, size, fields):
+		self.name = name
+		self.size = size
+
+		fields = sorted(fields, key=lambda f: f[1])
+		fmt = '>'
+		pos = 0
+		self.slices = []
+		formats = []
+		for field, offset, spec in fields:
+			count, char = re.fullmatch(r'(\d*)([BHIf])', spec).groups()
+			count = int(count or 1)
+			assert offset >= pos, '%s.%s overlaps the previous field' % (name, field)
+			fmt += ('%dx' % (offset - pos) if offset > pos else '') + ('%d' % count if count > 1 else '') + char
+			pos = offset + count * struct.calcsize('>' + char)
+			start = self.slices[-1][1] if self.slices else 0
+			self.slices.append((start, start + count))
+			formats.append(_dtypes[char] if count == 1 else (_dtypes[char], (count,)))
+		assert pos <= size, '%s is larger than its size' % name
+		fmt += '%dx' % (size - pos) if size > pos else ''
+
+		names = [f[0] for f in fields]
+		self.struct = struct.Struct(fmt)
+		self.dtype = numpy.dtype({'names': names, 'formats': formats, 'offsets': [f[1] for f in fields], 'itemsize': size})
+		self.tuple = namedtuple(name, names)
+
+	def read(self, mem, addr):
+		"""Return the struct at addr as a named tuple, with multi-value fields as tuples."""
+		values = self.struct.unpack_from(mem.data, addr - MEM1_START)
+		return self.tuple._make(values[a] if b - a == 1 else values[a:b] for a, b in self.slices)
+
+	def gather(self, mem, addrs):
+		"""Return the structs at each of addrs as a structured array."""
+		return mem.gather(addrs, self.dtype)
+
+	def readArray(self, mem, addr, count):
+		"""Return count consecutive structs starting at addr as a structured array."""
+		return numpy.frombuffer(mem.data, self.dtype, count, addr - MEM1_START)
+
+CAMERA = GameStruct('Camera', 0x154, [
+	('near', 0x28, 'f'),
+	('far', 0x2C, 'f'),
+	('up', 0x30, '3f'),
+	('fovy', 0x48, 'f'),
+	('position', 0x124, '3f'),
+	('target', 0x148, '3f'),
+])
+
+MAP_COLLISION_DATA = GameStruct('MapCollisionData', 0x1C, [
+	('checkListCount', 0x10, 'I'),
+	('checkLists', 0x14, '2I'),
+])
+
+# one cell of a check list table, with the heads of its floor, roof and wall lists
+CHECK_LIST_CELL = GameStruct('CheckListCell', 0x24, [
+	('floors', 0x4, 'I'),
+	('roofs', 0x10, 'I'),
+	('walls', 0x1C, 'I'),
+])
+
+CHECK_LIST = GameStruct('CheckList', 0xC, [
+	('next', 0x4, 'I'),
+	('checkData', 0x8, 'I'),
+])
+
+# TBGCheckData
+CHECK_DATA = GameStruct('CheckData', 0x34, [
+	('type', 0x0, 'H'),
+	('flags', 0x4, 'H'),
+	('vertices', 0x10, '9f'),
+])
+
+CUBE_MANAGER = GameStruct('CubeManager', 0x18, [
+	('count', 0x10, 'B'),
+	('info', 0x14, 'I'),
+])
+
+CUBE_INFO = GameStruct('CubeInfo', 0x14, [
+	('cubes', 0x10, 'I'),
+])
+
+CUBE = GameStruct('Cube', 0x30, [
+	('center', 0xC, '3f'),
+	('size', 0x24, '3f'),
+])
+
+MARIO = GameStruct('Mario', 0x1C, [
+	('position', 0x10, '3f'),
+])
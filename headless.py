@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+import numpy
+
+from PyQt5 import QtCore
+from PyQt5 import QtGui
+
+from OpenGL.GL import *
+
+from collision import CollisionRenderer
+from snapshot import MEM1_SIZE
+
+class DumpFile:
+	"""MEM1 read from a raw dump, such as Dolphin's Dump MEM1, standing in for a running Dolphin."""
+
+	def __init__(self, path):
+		self.memory = numpy.memmap(path, dtype='u1', mode='r', shape=(MEM1_SIZE,))
+
+	def read_ram(self, offset, size):
+		return self.memory[offset:offset+size]
+
+class HeadlessRenderer:
+	"""Render collision into an offscreen framebuffer, without showing any window."""
+
+	def __init__(self, width, height, cacheDir=None):
+		self.width = width
+		self.height = height
+
+		fmt = QtGui.QSurfaceFormat()
+		fmt.setVersion(3, 3)
+		fmt.setProfile(QtGui.QSurfaceFormat.CoreProfile)
+
+		self.context = QtGui.QOpenGLContext()
+		self.context.setFormat(fmt)
+		if not self.context.create():
+			raise RuntimeError('Could not create an OpenGL context')
+
+		self.surface = QtGui.QOffscreenSurface()
+		self.surface.setFormat(self.context.format())
+		self.surface.create()
+		if not self.context.makeCurrent(self.surface):
+			raise RuntimeError('Could not make the OpenGL context current')
+
+		self.fbo = QtGui.QOpenGLFramebufferObject(width, height, QtGui.QOpenGLFramebufferObject.CombinedDepthStencil)
+		self.fbo.bind()
+
+		self.renderer = CollisionRenderer(None)
+		self.renderer.initialize(cacheDir)
+		glViewport(0, 0, width, height)
+		glPixelStorei(GL_PACK_ALIGNMENT, 1)
+		self.pixels = numpy.empty((height, width, 3), dtype='u1')
+
+	def render(self, memory):
+		"""Render the collision in memory and return it as a (height, width, 3) array of RGB pixels, top row first."""
+
+		if not self.renderer.setGame(memory):
+			raise ValueError('Memory does not hold a known version of Sunshine')
+
+		self.renderer.render(self.width / self.height)
+		glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, self.pixels)
+		return self.pixels[::-1]
+
+def saveImage(image, path):
+	height, width, _ = image.shape
+	data = numpy.ascontiguousarray(image).tobytes()
+	if not QtGui.QImage(data, width, height, 3 * width, QtGui.QImage.Format_RGB888).save(path):
+		raise OSError('Could not write ' + path)
+
+# each worker process renders with its own context
+_app = None
+_worker = None
+
+def _initWorker(width, height):
+	global _app, _worker
+	_app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication(sys.argv[:1])
+	_app.setApplicationName('sms-livecol')
+	_worker = HeadlessRenderer(width, height,
+			os.path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation), 'shaders'))
+
+def _renderFrame(job):
+	"""Render one dump; save it to path if given, else return the raw pixels."""
+
+	dump, path = job
+	image = _worker.render(DumpFile(dump))
+	if path is None:
+		return image.tobytes()
+
+	saveImage(image, path)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Render the collision in MEM1 dumps without a window, '
+			'e.g. for thumbnails or regression images.')
+	parser.add_argument('dumps', nargs='+', help='raw MEM1 dumps, one per frame, in order')
+	parser.add_argument('-o', '--output', required=True,
+			help='PNG path, with a %%d-style placeholder for the frame number when rendering several dumps; '
+			'any other path (or - for stdout) receives raw rgb24 video')
+	parser.add_argument('-s', '--size', default='800x600', help='image size as WIDTHxHEIGHT (default: %(default)s)')
+	parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes rendering in parallel')
+	args = parser.parse_args()
+
+	width, height = map(int, args.size.lower().split('x'))
+
+	if args.output.lower().endswith('.png'):
+		if len(args.dumps) > 1 and '%' not in args.output:
+			parser.error('rendering several dumps to PNG needs a placeholder in the output path, e.g. frame%05d.png')
+		jobs = [(dump, args.output % i if '%' in args.output else args.output) for i, dump in enumerate(args.dumps)]
+		out = None
+	else:
+		jobs = [(dump, None) for dump in args.dumps]
+		out = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+
+	pool = None
+	if args.jobs > 1:
+		# contiguous chunks let each process reuse collision between consecutive frames
+		pool = multiprocessing.get_context('spawn').Pool(args.jobs, _initWorker, (width, height))
+		frames = pool.imap(_renderFrame, jobs, chunksize=max(1, len(jobs) // (4 * args.jobs)))
+	else:
+		_initWorker(width, height)
+		frames = map(_renderFrame, jobs)
+
+	for frame in frames:
+		if out is not None:
+			out.write(frame)
+
+	if pool is not None:
+		pool.close()
+		pool.join()
+	if out is not None and out is not sys.stdout.buffer:
+		out.close()
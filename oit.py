@@ -0,0 +1,133 @@
+import numpy
+
+from OpenGL.GL import *
+
+import shadercache
+
+COMPOSITE_VERTEX_SHADER = """#version 330 core
+	void main() {
+		// one triangle covering the whole viewport
+		vec2 p = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+		gl_Position = vec4(2 * p - 1, 0, 1);
+	}"""
+
+COMPOSITE_FRAGMENT_SHADER = """#version 330 core
+	uniform sampler2D opaqueTex;
+	uniform sampler2D accumTex;
+	uniform sampler2D weightTex;
+	out vec4 color;
+
+	void main() {
+		ivec2 p = ivec2(gl_FragCoord.xy);
+		vec4 opaque = texelFetch(opaqueTex, p, 0);
+		vec4 accum = texelFetch(accumTex, p, 0); // alpha holds the revealage
+		float weight = texelFetch(weightTex, p, 0).r;
+
+		vec3 average = accum.rgb / max(weight, 1e-5);
+		color = vec4(mix(average, opaque.rgb, accum.a), 1 - accum.a * (1 - opaque.a));
+	}"""
+
+class TransparencyBuffers:
+	"""Offscreen targets for weighted blended order-independent transparency.
+
+	Opaque geometry is drawn first with depth writes, then translucent geometry is
+	accumulated in any order against that depth, and end() resolves both into
+	the framebuffer that was bound when begin() was called. Without per-target blend
+	functions in GL 3.3, the accumulated colour and revealage share one RGBA target and
+	the weights go to a second one, which blend the same way.
+
+	Transparent fragment shaders must write the weighted premultiplied colour and the
+	alpha to output 0, and the weighted alpha to output 1.
+	"""
+
+	def __init__(self, cacheDir=None):
+		# self.cached tells whether the composite program came from the shader cache
+		self.composite, self.cached = shadercache.compileProgram([
+			(COMPOSITE_VERTEX_SHADER, GL_VERTEX_SHADER),
+			(COMPOSITE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+		], cacheDir)
+		glUseProgram(self.composite)
+		for unit, name in enumerate(('opaqueTex', 'accumTex', 'weightTex')):
+			glUniform1i(glGetUniformLocation(self.composite, name), unit)
+		glUseProgram(0)
+
+		self.vao = glGenVertexArrays(1)
+		self.fbo = glGenFramebuffers(1)
+		self.textures = glGenTextures(3)
+		self.depth = glGenRenderbuffers(1)
+		self.size = None
+		self.target = 0
+
+		self.opaqueBuffers = numpy.array([GL_COLOR_ATTACHMENT0], dtype='u4')
+		self.transparentBuffers = numpy.array([GL_COLOR_ATTACHMENT1, GL_COLOR_ATTACHMENT2], dtype='u4')
+		self.clearAccum = numpy.array([0, 0, 0, 1], dtype='f')
+		self.clearWeight = numpy.zeros(4, dtype='f')
+
+	def resize(self, width, height):
+		glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+		for i, (internalFormat, fmt) in enumerate(((GL_RGBA8, GL_RGBA), (GL_RGBA16F, GL_RGBA), (GL_R16F, GL_RED))):
+			glBindTexture(GL_TEXTURE_2D, self.textures[i])
+			glTexImage2D(GL_TEXTURE_2D, 0, internalFormat, width, height, 0, fmt, GL_FLOAT, None)
+			glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+			glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+			glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0 + i, GL_TEXTURE_2D, self.textures[i], 0)
+		glBindTexture(GL_TEXTURE_2D, 0)
+
+		glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+		glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+		glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+		glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+		if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+			raise RuntimeError('Transparency framebuffer is incomplete')
+		self.size = (width, height)
+
+	def begin(self):
+		"""Start the opaque pass, redirecting drawing away from the current framebuffer."""
+
+		self.target = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+		_, _, width, height = glGetIntegerv(GL_VIEWPORT)
+		if self.size != (width, height):
+			self.resize(width, height)
+
+		glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+		glDrawBuffers(1, self.opaqueBuffers)
+		glDepthMask(GL_TRUE)
+		glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+		glEnable(GL_DEPTH_TEST)
+		glEnable(GL_CULL_FACE)
+		glDisable(GL_BLEND)
+
+	def beginTransparent(self):
+		"""Start the transparent pass; faces are seen from both sides and need no sorting."""
+
+		glDrawBuffers(2, self.transparentBuffers)
+		glClearBufferfv(GL_COLOR, 0, self.clearAccum)
+		glClearBufferfv(GL_COLOR, 1, self.clearWeight)
+		glDepthMask(GL_FALSE)
+		glDisable(GL_CULL_FACE)
+		glEnable(GL_BLEND)
+		glBlendFuncSeparate(GL_ONE, GL_ONE, GL_ZERO, GL_ONE_MINUS_SRC_ALPHA)
+
+	def end(self):
+		"""Composite both passes into the framebuffer that was current at begin()."""
+
+		glBindFramebuffer(GL_FRAMEBUFFER, self.target)
+		glDisable(GL_BLEND)
+		glDisable(GL_DEPTH_TEST)
+		glDepthMask(GL_TRUE)
+
+		glUseProgram(self.composite)
+		for unit, texture in enumerate(self.textures):
+			glActiveTexture(GL_TEXTURE0 + unit)
+			glBindTexture(GL_TEXTURE_2D, texture)
+		glBindVertexArray(self.vao)
+		glDrawArrays(GL_TRIANGLES, 0, 3)
+
+		glBindVertexArray(0)
+		for unit in reversed(range(len(self.textures))):
+			glActiveTexture(GL_TEXTURE0 + unit)
+			glBindTexture(GL_TEXTURE_2D, 0)
+		glUseProgram(0)
+		glEnable(GL_DEPTH_TEST)
@@ -0,0 +1,123 @@
+import ctypes
+import hashlib
+import os
+import struct
+import tempfile
+import traceback
+
+import numpy
+
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from OpenGL.error import GLError
+
+_format = struct.Struct('<I')
+
+def supportsBinaries():
+	return bool(glGetProgramBinary) and int(glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS)) > 0
+
+def cacheKey(sources):
+	"""Return a key identifying a program built from sources by the current driver."""
+
+	h = hashlib.sha256()
+	for s in (glGetString(GL_VENDOR), glGetString(GL_RENDERER), glGetString(GL_VERSION)):
+		h.update(s or b'')
+		h.update(b'\0')
+	for source, stage in sources:
+		h.update(b'%d:' % stage)
+		h.update(source.encode())
+		h.update(b'\0')
+	return h.hexdigest()
+
+def loadBinary(path):
+	"""Return a program loaded from the binary at path, or 0 if it is missing or rejected by the driver."""
+
+	try:
+		with open(path, 'rb') as f:
+			data = f.read()
+	except OSError:
+		return 0
+
+	program = glCreateProgram()
+	try:
+		binary = data[_format.size:]
+		glProgramBinary(program, _format.unpack_from(data)[0], binary, len(binary))
+		if glGetProgramiv(program, GL_LINK_STATUS) == GL_TRUE:
+			return program
+	except (GLError, struct.error):
+		pass
+
+	glDeleteProgram(program)
+	return 0
+
+def saveBinary(program, path):
+	size = int(glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH))
+	if size == 0: # the driver kept no binary for this program
+		return
+
+	binary = ctypes.create_string_buffer(size)
+	length = numpy.zeros(1, dtype='i4')
+	fmt = numpy.zeros(1, dtype='u4')
+	glGetProgramBinary(program, size, length, fmt, binary)
+	if length[0] == 0:
+		return
+
+	# several processes may save the same program at once, so each writes its own file
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+		f.write(_format.pack(int(fmt[0])))
+		f.write(binary.raw[:length[0]])
+	try:
+		os.replace(f.name, path)
+	except OSError:
+		os.unlink(f.name)
+		raise
+
+def linkProgram(sources, retrievable):
+	"""Compile and link a program, asking the driver to keep its binary if retrievable is set."""
+
+	program = glCreateProgram()
+	stages = [shaders.compileShader(source, stage) for source, stage in sources]
+	for shader in stages:
+		glAttachShader(program, shader)
+	if retrievable:
+		glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+	glLinkProgram(program)
+
+	for shader in stages:
+		glDetachShader(program, shader)
+		glDeleteShader(shader)
+
+	if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+		log = glGetProgramInfoLog(program)
+		glDeleteProgram(program)
+		raise shaders.ShaderLinkError('Link failure: %s' % log)
+
+	return program
+
+def compileProgram(sources, cacheDir=None):
+	"""Build a shader program, reusing a linked binary cached in cacheDir when the driver allows it.
+
+	sources -- list of (source, stage) pairs, e.g. (VERTEX_SHADER, GL_VERTEX_SHADER)
+	cacheDir -- directory of cached program binaries, or None to always compile
+
+	Return the program and whether it was loaded from the cache.
+	"""
+
+	if cacheDir is not None and supportsBinaries():
+		path = os.path.join(cacheDir, cacheKey(sources) + '.bin')
+		program = loadBinary(path)
+		if program:
+			return program, True
+	else:
+		path = None
+
+	program = linkProgram(sources, path is not None)
+
+	if path is not None:
+		try:
+			saveBinary(program, path)
+		except (GLError, OSError):
+			traceback.print_exc()
+
+	return program, False
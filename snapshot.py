@@ -0,0 +1,97 @@
+import struct
+
+import numpy
+
+MEM1_START = 0x80000000
+MEM1_SIZE = 0x1800000
+
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT
+
+_u32 = struct.Struct('>I')
+
+def inMem1(addr, size):
+	"""Return whether size bytes at addr lie within MEM1; addr may also be an array of addresses."""
+	return (addr >= MEM1_START) & (addr <= MEM1_START + MEM1_SIZE - size)
+
+class Snapshot:
+	"""Local copy of MEM1, refreshed once per frame.
+
+	The game's objects are read out of it through the GameStruct layouts in gamestructs;
+	read_uint32 is left for following the pointers that lead to them.
+	"""
+
+	def __init__(self, dolphin):
+		self.dolphin = dolphin
+		self.data = numpy.zeros(MEM1_SIZE, dtype='u1')
+
+	def update(self):
+		self.data[:] = numpy.frombuffer(self.dolphin.read_ram(0, MEM1_SIZE), dtype='u1')
+
+	def read_uint32(self, addr):
+		return _u32.unpack_from(self.data, addr - MEM1_START)[0]
+
+	def gather(self, addrs, dtype):
+		"""Return an array of the value of dtype at each of addrs.
+
+		dtype -- big-endian numpy dtype, e.g. '>f4', ('>u4', (3,)) or a GameStruct's dtype
+		"""
+
+		# a view with an item starting at every byte, so indexing copies only the items asked for
+		dtype = numpy.dtype(dtype)
+		items = numpy.ndarray((MEM1_SIZE - dtype.itemsize + 1,), dtype, self.data, strides=(1,))
+		return items[numpy.asarray(addrs, dtype='i8') - MEM1_START]
+
+class DirtyPages:
+	"""Track which pages of MEM1 changed since the caches built from them were last refreshed.
+
+	Every update hashes the snapshot in PAGE_SIZE pages and marks the pages whose hash
+	differs from the previous one. Marks accumulate until clear() is called, so a frame
+	that bails out early does not lose changes.
+	"""
+
+	def __init__(self):
+		rng = numpy.random.default_rng(0x534D53)
+		self.weights = rng.integers(1, 1 << 63, PAGE_SIZE // 8, dtype='u8') | 1
+		self.hashes = None
+		self.dirty = numpy.ones(MEM1_SIZE >> PAGE_SHIFT, dtype=bool)
+
+	def update(self, snapshot):
+		# weighted sum of the page's 64-bit words, wrapping on overflow
+		hashes = snapshot.data.view('u8').reshape(-1, PAGE_SIZE // 8) @ self.weights
+		if self.hashes is None:
+			self.dirty[:] = True
+		else:
+			self.dirty |= hashes != self.hashes
+		self.hashes = hashes
+
+	def clear(self):
+		self.dirty[:] = False
+
+	def span(self, addr, size):
+		"""Return the indices of the pages covering size bytes at addr, leaving out any outside MEM1."""
+		first = max((addr - MEM1_START) >> PAGE_SHIFT, 0)
+		last = min((addr + size - 1 - MEM1_START) >> PAGE_SHIFT, len(self.dirty) - 1)
+		return numpy.arange(first, last + 1)
+
+	def pages(self, addrs, size):
+		"""Return the indices of the pages covering size bytes at each of addrs, leaving out any outside MEM1.
+
+		size must not exceed PAGE_SIZE.
+		"""
+
+		addrs = numpy.asarray(addrs, dtype='i8') - MEM1_START
+		pages = numpy.unique(numpy.concatenate([addrs >> PAGE_SHIFT, (addrs + size - 1) >> PAGE_SHIFT]))
+		return pages[(pages >= 0) & (pages < len(self.dirty))]
+
+	def touched(self, addrs, size):
+		"""Return a mask of which objects of size bytes at addrs lie on dirty pages.
+
+		size must not exceed PAGE_SIZE.
+		"""
+
+		addrs = numpy.asarray(addrs, dtype='i8') - MEM1_START
+		return self.dirty[addrs >> PAGE_SHIFT] | self.dirty[(addrs + size - 1) >> PAGE_SHIFT]
+
+	def isDirty(self, pages):
+		return bool(self.dirty[pages].any())